@@ -1,7 +1,19 @@
 __title__ = "bookops-overdrive"
 __version__ = "0.0.1"
 
+from .archive import ResponseArchiver
 from .authorize import OverdriveAccessToken
+from .dedupe import ReserveIdBloomFilter, ReserveIdSet
+from .ratelimit import FileRateLimiter
+from .scheduler import AvailabilityScheduler
 from .session import OverdriveSession
 
-__all__ = ["OverdriveAccessToken", "OverdriveSession"]
+__all__ = [
+    "AvailabilityScheduler",
+    "FileRateLimiter",
+    "OverdriveAccessToken",
+    "OverdriveSession",
+    "ReserveIdBloomFilter",
+    "ReserveIdSet",
+    "ResponseArchiver",
+]
@@ -0,0 +1,161 @@
+"""Provides archiving of raw, still-compressed responses from Overdrive APIs"""
+
+from __future__ import annotations
+
+import datetime
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import IO, Any
+
+import requests
+import urllib3
+
+from .errors import BookopsOverdriveError
+
+
+class ResponseArchiver:
+    """
+    The `ResponseArchiver` class writes response bodies to disk exactly as they
+    were received from the server. The body is read from the underlying
+    connection in fixed-size chunks without being decompressed or decoded, so
+    archiving uses little CPU and constant memory. Each archived response is
+    recorded in a JSON Lines manifest with its size, SHA-256 hash and request
+    details.
+
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        manifest: str = "manifest.jsonl",
+        chunk_size: int = 64 * 1024,
+    ) -> None:
+        """Initializes `ResponseArchiver` class instance.
+
+        Args:
+            directory:
+                Directory where archived responses and the manifest are written.
+                The directory is created if it does not exist.
+            manifest:
+                Name of the manifest file within `directory`.
+                Default is 'manifest.jsonl'.
+            chunk_size:
+                Number of bytes read from the connection at a time.
+                Default is 65536.
+
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.chunk_size = chunk_size
+        self.directory = directory
+        self.manifest = os.path.join(directory, manifest)
+        self._lock = threading.Lock()
+
+    def _suffix(self, response: requests.Response) -> str:
+        encoding = response.headers.get("Content-Encoding", "").strip().lower()
+        return {"gzip": ".json.gz", "deflate": ".json.zz", "br": ".json.br"}.get(
+            encoding, ".json"
+        )
+
+    def _copy(self, response: requests.Response, fh: IO[bytes]) -> tuple[int, str]:
+        """Copies raw response body to `fh` and returns its size and SHA-256 hash."""
+        if response.raw is None or response._content_consumed:
+            raise BookopsOverdriveError(
+                "Response body is not available for archiving. "
+                "The request must be sent with `stream=True`."
+            )
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            for chunk in response.raw.stream(self.chunk_size, decode_content=False):
+                fh.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+        except (urllib3.exceptions.HTTPError, requests.RequestException) as exc:
+            raise BookopsOverdriveError(f"Error reading response body: {exc!r}")
+        finally:
+            response.close()
+        return size, digest.hexdigest()
+
+    def _target(self, name: str) -> str:
+        """
+        Returns the path of a file to be written within `directory`.
+
+        Raises:
+            BookopsOverdriveError: If `name` is not a bare file name or the file
+                already exists.
+        """
+        if not name or name in (".", "..") or os.path.basename(name) != name:
+            raise BookopsOverdriveError(
+                f"Invalid archive file name: '{name}'. "
+                "Expected a file name without directories."
+            )
+        path = os.path.join(self.directory, name)
+        if os.path.lexists(path):
+            raise BookopsOverdriveError(f"Archive file '{name}' already exists.")
+        return path
+
+    def archive(
+        self, response: requests.Response, destination: str | IO[bytes] | None = None
+    ) -> dict[str, Any]:
+        """
+        Writes the raw body of a streamed response and records it in the manifest.
+
+        Args:
+            response:
+                `requests.Response` instance of a request sent with `stream=True`.
+            destination:
+                File name within `directory` or a writable binary buffer. The
+                file name may not include directories and the file may not
+                already exist. Default is a file named after the body's SHA-256
+                hash with a suffix matching its `Content-Encoding`.
+
+        Returns:
+            manifest entry for the response as a dict
+
+        Raises:
+            BookopsOverdriveError: If the response body has already been read,
+                the connection fails while it is being read or `destination` is
+                not a valid file name.
+        """
+        if isinstance(destination, str):
+            try:
+                target = self._target(destination)
+            except BookopsOverdriveError:
+                response.close()
+                raise
+        if destination is None or isinstance(destination, str):
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".part")
+            try:
+                with os.fdopen(fd, "wb") as fh:
+                    size, sha256 = self._copy(response, fh)
+                if destination is None:
+                    name = f"{sha256}{self._suffix(response)}"
+                    target = os.path.join(self.directory, name)
+                else:
+                    name = destination
+                os.replace(tmp, target)
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+        else:
+            name = None
+            size, sha256 = self._copy(response, destination)
+
+        entry = {
+            "archived_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "bytes": size,
+            "content_encoding": response.headers.get("Content-Encoding"),
+            "content_type": response.headers.get("Content-Type"),
+            "file": name,
+            "method": response.request.method if response.request else None,
+            "sha256": sha256,
+            "status_code": response.status_code,
+            "url": response.url,
+        }
+        with self._lock, open(self.manifest, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(entry) + "\n")
+        return entry
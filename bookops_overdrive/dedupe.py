@@ -0,0 +1,185 @@
+"""Provides memory-compact structures for de-duplicating reserveIds in harvests"""
+
+from __future__ import annotations
+
+import hashlib
+import math
+import uuid
+
+
+def _pack(reserveId: object) -> bytes | None:
+    """Packs a GUID reserveId into 16 bytes or returns `None` if it is not a GUID."""
+    if not isinstance(reserveId, str):
+        return None
+    try:
+        return uuid.UUID(reserveId).bytes
+    except ValueError:
+        return None
+
+
+class ReserveIdSet:
+    """
+    The `ReserveIdSet` class is a set of reserveIds that stores each GUID as a
+    packed 16-byte value in a single open-addressing hash table backed by a
+    `bytearray`. This takes a fraction of the memory of a Python `set` of
+    reserveId strings. Identifiers that are not GUIDs are kept in a regular
+    `set`.
+
+    """
+
+    _EMPTY = bytes(16)
+    _MAX_LOAD = 0.7
+
+    def __init__(self, capacity: int = 1024) -> None:
+        """Initializes `ReserveIdSet` class instance.
+
+        Args:
+            capacity:
+                Number of reserveIds the set can hold before it is resized.
+                Default is 1024.
+
+        """
+        size = 8
+        while size * self._MAX_LOAD < capacity:
+            size *= 2
+        self._has_nil = False
+        self._len = 0
+        self._mask = size - 1
+        self._other: set[str] = set()
+        self._slots = bytearray(size * 16)
+
+    def __contains__(self, reserveId: object) -> bool:
+        key = _pack(reserveId)
+        if key is None:
+            return reserveId in self._other
+        if key == self._EMPTY:
+            return self._has_nil
+        return self._find(key)[1]
+
+    def __len__(self) -> int:
+        return self._len + len(self._other) + self._has_nil
+
+    def _find(self, key: bytes) -> tuple[int, bool]:
+        """
+        Locates the slot for a packed key using linear probing.
+
+        Returns:
+            tuple of slot index and whether the key is stored in that slot
+        """
+        slots = self._slots
+        index = hash(key) & self._mask
+        while True:
+            start = index * 16
+            stored = slots[start : start + 16]
+            if stored == key:
+                return index, True
+            if stored == self._EMPTY:
+                return index, False
+            index = (index + 1) & self._mask
+
+    def _resize(self) -> None:
+        old = self._slots
+        self._mask = (self._mask + 1) * 2 - 1
+        self._slots = bytearray((self._mask + 1) * 16)
+        for start in range(0, len(old), 16):
+            key = bytes(old[start : start + 16])
+            if key != self._EMPTY:
+                index = self._find(key)[0] * 16
+                self._slots[index : index + 16] = key
+
+    def add(self, reserveId: str) -> bool:
+        """
+        Adds a reserveId to the set.
+
+        Args:
+            reserveId: the reserveId to add
+
+        Returns:
+            `True` if the reserveId was not already in the set, otherwise `False`
+        """
+        key = _pack(reserveId)
+        if key is None:
+            if reserveId in self._other:
+                return False
+            self._other.add(reserveId)
+            return True
+        if key == self._EMPTY:
+            added = not self._has_nil
+            self._has_nil = True
+            return added
+        index, found = self._find(key)
+        if found:
+            return False
+        self._slots[index * 16 : index * 16 + 16] = key
+        self._len += 1
+        if self._len > (self._mask + 1) * self._MAX_LOAD:
+            self._resize()
+        return True
+
+
+class ReserveIdBloomFilter:
+    """
+    The `ReserveIdBloomFilter` class is an approximate set of reserveIds. It
+    never reports an added reserveId as missing, but may report a reserveId
+    that was never added as present with a probability close to `error_rate`.
+    Memory use is fixed at creation and is a few bits per reserveId. When used
+    to de-duplicate a harvest, each false positive drops a title from the
+    results; use `ReserveIdSet` when every title must be kept.
+
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001) -> None:
+        """Initializes `ReserveIdBloomFilter` class instance.
+
+        Args:
+            capacity:
+                Expected number of reserveIds to be added.
+            error_rate:
+                Acceptable probability of a false positive once `capacity`
+                reserveIds have been added. Default is 0.001.
+
+        """
+        capacity = max(capacity, 1)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(
+            math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2), 8
+        )
+        self.hash_count = max(round(self.size / capacity * math.log(2)), 1)
+        self._bits = bytearray(math.ceil(self.size / 8))
+        self._len = 0
+
+    def __contains__(self, reserveId: object) -> bool:
+        bits = self._bits
+        return all(bits[i >> 3] & (1 << (i & 7)) for i in self._positions(reserveId))
+
+    def __len__(self) -> int:
+        return self._len
+
+    def _positions(self, reserveId: object) -> list[int]:
+        key = _pack(reserveId) or str(reserveId).encode("utf-8")
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, reserveId: str) -> bool:
+        """
+        Adds a reserveId to the filter.
+
+        Args:
+            reserveId: the reserveId to add
+
+        Returns:
+            `True` if the reserveId was not already in the filter, otherwise
+            `False` (which may rarely be a false positive)
+        """
+        added = False
+        bits = self._bits
+        for i in self._positions(reserveId):
+            mask = 1 << (i & 7)
+            if not bits[i >> 3] & mask:
+                bits[i >> 3] |= mask
+                added = True
+        self._len += added
+        return added
@@ -3,6 +3,9 @@
 from __future__ import annotations
 
 import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
 from typing import TYPE_CHECKING
 
 import requests
@@ -19,6 +22,12 @@ class Query:
     if the session's associated access token has expired before sending the request.
     This ensures that requests will always be sent with an unexpired token.
 
+    If the session has a circuit breaker enabled, requests to an endpoint that has
+    been failing are rejected without being sent. If the session has hedging enabled
+    and `hedge` is `True`, a duplicate request is sent when the first one has not
+    been answered within the configured percentile of recent response times and
+    whichever response arrives first is used.
+
     """
 
     def __init__(
@@ -26,6 +35,9 @@ class Query:
         session: OverdriveSession,
         prepared_request: requests.PreparedRequest,
         timeout: int | float | tuple[int | float, int | float] | None = (5, 5),
+        endpoint: str | None = None,
+        hedge: bool = False,
+        stream: bool = False,
     ) -> None:
         """Initializes `Query` class instance.
 
@@ -39,20 +51,147 @@ class Query:
                 How many seconds to wait for the server to respond. Accepts a single
                 value to be applied to both connect and read timeouts or two separate
                 values. Default is 5 seconds for connect and read timeouts.
+            endpoint:
+                Name used to group requests for latency tracking and circuit
+                breaking. Default is the path of the request's url.
+            hedge:
+                Whether a duplicate request may be sent if the first one is slow.
+                Only applies if the session was created with `hedge_percentile`.
+                Default is `False`.
+            stream:
+                Whether to leave the response body unread so it can be consumed
+                from `response.raw`. Default is `False`.
 
         Raises:
-            BookopsOverdriveError: If the request encounters any errors.
+            BookopsOverdriveError: If the request encounters any errors or the
+                circuit breaker for the endpoint is open.
 
         """
+        self.endpoint = endpoint or str(prepared_request.path_url).split("?")[0]
+        self.session = session
+        self.stream = stream
+        self.timeout = timeout
+
+        breaker = session._get_circuit_breaker(self.endpoint)
+        if breaker is not None and not breaker.allow_request():
+            raise BookopsOverdriveError(
+                f"Circuit breaker open for '{self.endpoint}' endpoint. "
+                "Request not sent."
+            )
 
-        if session.authorization.is_expired:
-            session._request_new_access_token()
         try:
-            self.response = session.send(prepared_request, timeout=timeout)
+            if session.authorization.is_expired:
+                session._request_new_access_token()
+            if session.rate_limiter is not None:
+                session.rate_limiter.acquire()
+            if (
+                hedge
+                and session.hedge_percentile is not None
+                and (breaker is None or breaker.state == breaker.CLOSED)
+            ):
+                self.response = self._send_hedged(
+                    prepared_request, session.hedge_percentile
+                )
+            else:
+                self.response = self._send(prepared_request)
             self.response.raise_for_status()
-        except (requests.Timeout, requests.ConnectionError):
-            raise BookopsOverdriveError(f"Error connecting: {sys.exc_info()[0]}")
         except requests.HTTPError as exc:
+            if breaker is not None:
+                if self.response.status_code >= 500:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
             raise BookopsOverdriveError(
-                f"{exc}. Server response: {self.response.content.decode('utf-8')}"
+                f"{exc}. Server response: {self._read_error_body()}"
+            )
+        except (requests.Timeout, requests.ConnectionError):
+            if breaker is not None:
+                breaker.record_failure()
+            raise BookopsOverdriveError(f"Error connecting: {sys.exc_info()[0]}")
+        except requests.RequestException as exc:
+            if breaker is not None:
+                breaker.record_failure()
+            raise BookopsOverdriveError(f"Error sending request: {exc!r}")
+        except BaseException:
+            if breaker is not None:
+                breaker.release()
+            raise
+        else:
+            if breaker is not None:
+                breaker.record_success()
+
+    def _read_error_body(self) -> str:
+        """
+        Reads the body of an error response. Streamed responses are read here
+        for the first time, so a failure while reading is reported in the
+        message instead of being raised.
+        """
+        try:
+            return self.response.content.decode("utf-8", errors="replace")
+        except requests.RequestException:
+            return "<unreadable body>"
+
+    def _send(self, prepared_request: requests.PreparedRequest) -> requests.Response:
+        """
+        Sends request and records how long the server took to respond. Streamed
+        requests return once headers arrive, so their response times are not
+        recorded.
+        """
+        start = time.perf_counter()
+        response = self.session.send(
+            prepared_request, timeout=self.timeout, stream=self.stream
+        )
+        if not self.stream:
+            self.session._get_latency_tracker(self.endpoint).record(
+                time.perf_counter() - start
             )
+        return response
+
+    def _send_hedged(
+        self, prepared_request: requests.PreparedRequest, percentile: float
+    ) -> requests.Response:
+        """
+        Sends request and, if no response arrives before the hedge delay, sends a
+        duplicate request. Returns the first successful response.
+        """
+        tracker = self.session._get_latency_tracker(self.endpoint)
+        delay = tracker.percentile(percentile)
+        if delay is None:
+            return self._send(prepared_request)
+
+        slots = self.session._hedge_slots
+        if not slots.acquire(blocking=False):
+            return self._send(prepared_request)
+
+        executor = self.session._get_hedge_executor()
+        try:
+            futures = [executor.submit(self._send, prepared_request)]
+            done, _ = wait(futures, timeout=delay)
+            # a duplicate is only sent if the rate limiter has a token to spare
+            limiter = self.session.rate_limiter
+            if not done and (limiter is None or limiter.try_acquire()):
+                futures.append(executor.submit(self._send, prepared_request.copy()))
+        except BaseException:
+            slots.release()
+            raise
+
+        # the slot is freed only once every request of the hedge has finished
+        lock = threading.Lock()
+        remaining = [len(futures)]
+
+        def release_slot(future: Future) -> None:
+            with lock:
+                remaining[0] -= 1
+                if not remaining[0]:
+                    slots.release()
+
+        for future in futures:
+            future.add_done_callback(release_slot)
+
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+        return futures[0].result()
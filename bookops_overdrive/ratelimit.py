@@ -0,0 +1,131 @@
+"""Provides rate limiting of requests shared by processes on a single host"""
+
+from __future__ import annotations
+
+import os
+import struct
+import sys
+import time
+from typing import Protocol
+
+from .errors import BookopsOverdriveError
+
+if sys.platform == "win32":  # pragma: no cover
+    import msvcrt
+
+    def _lock(fd: int) -> None:
+        # LK_LOCK gives up after about 10 seconds, so keep retrying
+        while True:
+            os.lseek(fd, 0, os.SEEK_SET)
+            try:
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue
+
+    def _unlock(fd: int) -> None:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+else:
+    import fcntl
+
+    def _lock(fd: int) -> None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+
+    def _unlock(fd: int) -> None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+class RateLimiter(Protocol):
+    """Interface for rate limiters accepted by `OverdriveSession`."""
+
+    def acquire(self) -> None:
+        """Blocks until a request may be sent."""
+        ...  # pragma: no cover
+
+    def try_acquire(self) -> bool:
+        """Takes a token without waiting and returns `False` if none is available."""
+        ...  # pragma: no cover
+
+
+class FileRateLimiter:
+    """
+    The `FileRateLimiter` class is a token bucket whose state is kept in a small
+    file guarded by an exclusive file lock. Every process that creates a
+    `FileRateLimiter` with the same `path` draws from the same bucket, so a group
+    of workers using one Overdrive API key stays under the key's limit as a whole.
+
+    """
+
+    _STATE = struct.Struct("<dd")
+
+    def __init__(self, path: str, rate: float, capacity: float | None = None) -> None:
+        """Initializes `FileRateLimiter` class instance.
+
+        Args:
+            path:
+                Path to the file that stores the bucket's state. The file is
+                created if it does not exist.
+            rate:
+                Number of requests per second allowed across all processes.
+            capacity:
+                Maximum number of requests that may be sent in a burst.
+                Default is `rate`, or 1 if `rate` is lower than 1.
+
+        Raises:
+            BookopsOverdriveError: If `rate` or `capacity` is not positive.
+
+        """
+        if rate <= 0 or (capacity is not None and capacity <= 0):
+            raise BookopsOverdriveError("Rate and capacity must be greater than 0.")
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self.path = path
+        self.rate = rate
+
+    def _take(self, tokens: float) -> float:
+        """
+        Takes tokens from the bucket if enough are available.
+
+        Returns:
+            0 if tokens were taken, otherwise number of seconds to wait before
+            enough tokens are available.
+        """
+        flags = os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0)
+        fd = os.open(self.path, flags, 0o666)
+        try:
+            _lock(fd)
+            try:
+                now = time.time()
+                os.lseek(fd, 0, os.SEEK_SET)
+                data = os.read(fd, self._STATE.size)
+                if len(data) == self._STATE.size:
+                    available, updated = self._STATE.unpack(data)
+                    elapsed = max(now - updated, 0)
+                    available = min(self.capacity, available + elapsed * self.rate)
+                else:
+                    available = self.capacity
+                if available >= tokens:
+                    available -= tokens
+                    wait = 0.0
+                else:
+                    wait = (tokens - available) / self.rate
+                os.lseek(fd, 0, os.SEEK_SET)
+                os.write(fd, self._STATE.pack(available, now))
+                return wait
+            finally:
+                _unlock(fd)
+        finally:
+            os.close(fd)
+
+    def acquire(self) -> None:
+        """Blocks until a request may be sent."""
+        while True:
+            wait = self._take(1)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    def try_acquire(self) -> bool:
+        """Takes a token without waiting and returns `False` if none is available."""
+        return not self._take(1)
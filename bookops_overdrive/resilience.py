@@ -0,0 +1,136 @@
+"""Provides latency tracking and circuit breaking for requests to Overdrive APIs"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections import deque
+
+
+class LatencyTracker:
+    """
+    The `LatencyTracker` class keeps a rolling window of response times for a
+    single endpoint. The recorded latencies are used to decide how long to wait
+    before sending a hedged (duplicate) request.
+
+    """
+
+    def __init__(self, window: int = 100, min_samples: int = 20) -> None:
+        """Initializes `LatencyTracker` class instance.
+
+        Args:
+            window:
+                Number of most recent response times to keep. Default is 100.
+            min_samples:
+                Number of response times that must be recorded before a
+                percentile is reported. Default is 20.
+
+        """
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, pct: float) -> float | None:
+        """
+        Calculates the given percentile of recorded response times using the
+        nearest-rank method.
+
+        Args:
+            pct: percentile to calculate as a float between 0 and 100.
+
+        Returns:
+            response time in seconds as a float or `None` if not enough response
+            times have been recorded yet.
+        """
+        with self._lock:
+            if len(self._samples) < max(self.min_samples, 1):
+                return None
+            ordered = sorted(self._samples)
+        rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+        return ordered[min(rank, len(ordered)) - 1]
+
+    def record(self, seconds: float) -> None:
+        """Records a response time in seconds."""
+        with self._lock:
+            self._samples.append(seconds)
+
+
+class CircuitBreaker:
+    """
+    The `CircuitBreaker` class tracks consecutive failures for a single endpoint.
+    Once `failure_threshold` consecutive failures have been recorded the circuit
+    opens and requests to the endpoint are rejected until `reset_timeout` seconds
+    have passed. After that a single trial request is let through: if it succeeds
+    the circuit closes, if it fails the circuit opens again.
+
+    """
+
+    CLOSED = "closed"
+    HALF_OPEN = "half-open"
+    OPEN = "open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30) -> None:
+        """Initializes `CircuitBreaker` class instance.
+
+        Args:
+            failure_threshold:
+                Number of consecutive failures that opens the circuit.
+                Default is 5.
+            reset_timeout:
+                How many seconds the circuit stays open before a trial request
+                is allowed. Default is 30 seconds.
+
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._lock = threading.Lock()
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        """Returns current state of the circuit."""
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow_request(self) -> bool:
+        """Checks if a request may be sent to the endpoint."""
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_failure(self) -> None:
+        """Records a failed request and opens the circuit if needed."""
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """
+        Ends a trial request without changing the state of the circuit. Used when
+        a request could not be completed for reasons unrelated to the endpoint.
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        """Records a successful request and closes the circuit."""
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
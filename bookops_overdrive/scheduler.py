@@ -0,0 +1,313 @@
+"""Provides a scheduler that keeps availability of frequently viewed titles fresh"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any
+
+from .errors import BookopsOverdriveError
+
+if TYPE_CHECKING:
+    from .session import OverdriveSession  # pragma: no cover
+
+
+AvailabilityCallback = Callable[[str, dict[str, Any] | None, dict[str, Any]], None]
+ErrorCallback = Callable[[Exception], None]
+
+logger = logging.getLogger(__name__)
+
+
+class _TrackedTitle:
+    """Polling schedule and last known availability for a single title."""
+
+    __slots__ = ("availability", "interval", "next_due", "priority")
+
+    def __init__(self, interval: float, priority: int, next_due: float) -> None:
+        self.availability: dict[str, Any] | None = None
+        self.interval = interval
+        self.next_due = next_due
+        self.priority = priority
+
+
+class AvailabilityScheduler:
+    """
+    The `AvailabilityScheduler` class keeps availability of a working set of
+    titles up to date. Each tracked `reserveId` has its own refresh interval and
+    priority. On each poll the titles that are due are grouped, highest priority
+    first, into as few `get_bulk_availability` requests as the API allows and the
+    requests are sent concurrently. If `max_batches` is set, only that many
+    requests are sent per poll, so lower priority titles wait until capacity
+    is available.
+
+    Subscribers are notified only when a title's copy counts change. The first
+    availability retrieved for a title is always reported.
+
+    """
+
+    BATCH_SIZE = 25
+    COPY_FIELDS = ("copiesOwned", "copiesAvailable", "numberOfHolds")
+
+    def __init__(
+        self,
+        session: OverdriveSession,
+        collectionToken: str,
+        interval: float = 60,
+        max_workers: int = 4,
+        max_batches: int | None = None,
+    ) -> None:
+        """Initializes `AvailabilityScheduler` class instance.
+
+        Args:
+            session:
+                An `OverdriveSession` object.
+            collectionToken:
+                a token which identifies the the requesting institution.
+            interval:
+                Default number of seconds between refreshes of a title.
+                Default is 60 seconds.
+            max_workers:
+                Maximum number of availability requests sent at the same time.
+                Default is 4.
+            max_batches:
+                Maximum number of availability requests sent per poll. Titles
+                that do not fit stay due for the next poll. Default is `None`
+                which requests all due titles on every poll.
+
+        """
+        self.collectionToken = collectionToken
+        self.interval = interval
+        self.max_batches = max_batches
+        self.max_workers = max_workers
+        self.session = session
+        self._lock = threading.Lock()
+        self._subscribers: list[AvailabilityCallback] = []
+        self._titles: dict[str, _TrackedTitle] = {}
+
+    def __contains__(self, reserveId: str) -> bool:
+        return reserveId.lower() in self._titles
+
+    def __len__(self) -> int:
+        return len(self._titles)
+
+    def _copy_counts(self, availability: dict[str, Any] | None) -> tuple | None:
+        if availability is None:
+            return None
+        return tuple(availability.get(field) for field in self.COPY_FIELDS)
+
+    def _fetch(self, reserveIds: list[str]) -> list[dict[str, Any]]:
+        response = self.session.get_bulk_availability(
+            self.collectionToken, reserveIds=reserveIds
+        )
+        try:
+            data = response.json()
+        except ValueError as exc:
+            raise BookopsOverdriveError(f"Unable to parse availability response: {exc}")
+        if not isinstance(data, dict):
+            raise BookopsOverdriveError(
+                f"Unexpected availability response: {type(data).__name__}"
+            )
+        return data.get("availability") or []
+
+    def _notify(
+        self,
+        reserveId: str,
+        previous: dict[str, Any] | None,
+        availability: dict[str, Any],
+        on_error: ErrorCallback | None,
+    ) -> None:
+        """
+        Notifies every subscriber of a change. An error raised by one subscriber
+        is passed to `on_error` (or logged) and does not stop the others.
+        """
+        for callback in list(self._subscribers):
+            try:
+                callback(reserveId, previous, availability)
+            except Exception as exc:
+                if on_error is not None:
+                    on_error(exc)
+                else:
+                    logger.exception("Availability subscriber failed for %s", reserveId)
+
+    def _update(
+        self,
+        reserveId: str,
+        availability: dict[str, Any],
+        on_error: ErrorCallback | None = None,
+    ) -> bool:
+        with self._lock:
+            title = self._titles.get(reserveId)
+            if title is None:
+                return False
+            previous = title.availability
+            title.availability = availability
+        if self._copy_counts(previous) == self._copy_counts(availability):
+            return False
+        self._notify(reserveId, previous, availability, on_error)
+        return True
+
+    def _reschedule(self, reserveIds: list[str], now: float) -> None:
+        with self._lock:
+            for reserveId in reserveIds:
+                title = self._titles.get(reserveId)
+                if title is not None:
+                    title.next_due = now + title.interval
+
+    def availability(self, reserveId: str) -> dict[str, Any] | None:
+        """
+        Returns last retrieved availability for a title or `None` if it has not
+        been retrieved yet.
+        """
+        title = self._titles.get(reserveId.lower())
+        return title.availability if title is not None else None
+
+    def due(self, now: float | None = None) -> list[str]:
+        """
+        Lists titles that are due to be refreshed.
+
+        Args:
+            now: `time.monotonic()` value to compare against. Default is current time.
+
+        Returns:
+            list of reserveIds ordered by priority (highest first) and then by
+            how long they have been waiting.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            due = [(t.priority, t.next_due, k) for k, t in self._titles.items()]
+        due = [d for d in due if d[1] <= now]
+        due.sort(key=lambda d: (-d[0], d[1]))
+        return [d[2] for d in due]
+
+    def poll(
+        self, now: float | None = None, on_error: ErrorCallback | None = None
+    ) -> list[str]:
+        """
+        Retrieves availability for all titles that are due and notifies
+        subscribers of any changes.
+
+        Args:
+            now: `time.monotonic()` value to compare against. Default is current time.
+            on_error:
+                callable passed any error raised by a subscriber. Default logs
+                the error. A failing subscriber does not stop other subscribers
+                or the rest of the poll.
+
+        Returns:
+            list of reserveIds whose copy counts changed.
+
+        Raises:
+            BookopsOverdriveError: If any availability request fails. Titles in a
+                failed request stay due and are retried on the next poll.
+
+        """
+        now = time.monotonic() if now is None else now
+        due = self.due(now)
+        batches = [
+            due[i : i + self.BATCH_SIZE] for i in range(0, len(due), self.BATCH_SIZE)
+        ]
+        if self.max_batches is not None:
+            batches = batches[: self.max_batches]
+        if not batches:
+            return []
+
+        changed: list[str] = []
+        error: BookopsOverdriveError | None = None
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self._fetch, batch) for batch in batches]
+            for batch, future in zip(batches, futures):
+                try:
+                    results = future.result()
+                except BookopsOverdriveError as exc:
+                    error = error or exc
+                    continue
+                self._reschedule(batch, now)
+                for item in results:
+                    reserveId = str(item.get("reserveId", "")).lower()
+                    if self._update(reserveId, item, on_error):
+                        changed.append(reserveId)
+        if error is not None:
+            raise error
+        return changed
+
+    def run(
+        self,
+        stop: threading.Event,
+        tick: float = 1,
+        on_error: ErrorCallback | None = None,
+    ) -> None:
+        """
+        Polls for due titles until `stop` is set. Failed polls and failing
+        subscribers do not end the loop; titles in failed requests stay due and
+        are retried.
+
+        Args:
+            stop: `threading.Event` that ends the loop when set.
+            tick: Maximum number of seconds to wait between polls. Default is 1.
+            on_error:
+                callable passed the error raised by a failed poll or subscriber.
+                Default logs the error.
+
+        """
+        while not stop.is_set():
+            try:
+                self.poll(on_error=on_error)
+            except Exception as exc:
+                if on_error is not None:
+                    on_error(exc)
+                else:
+                    logger.exception("Availability poll failed")
+                stop.wait(tick)
+                continue
+            with self._lock:
+                next_due = min(
+                    (t.next_due for t in self._titles.values()), default=float("inf")
+                )
+            stop.wait(min(max(next_due - time.monotonic(), 0), tick))
+
+    def subscribe(self, callback: AvailabilityCallback) -> None:
+        """
+        Registers a callable that is notified when a title's copy counts change.
+        The callable is passed the reserveId, previous availability (or `None`)
+        and new availability.
+        """
+        self._subscribers.append(callback)
+
+    def track(
+        self, reserveId: str, interval: float | None = None, priority: int = 0
+    ) -> None:
+        """
+        Adds a title to the working set or updates its schedule. Newly added
+        titles are due immediately.
+
+        Args:
+            reserveId:
+                the reserveId of the title.
+            interval:
+                Number of seconds between refreshes of the title. Default is the
+                scheduler's `interval`.
+            priority:
+                Titles with higher priority are requested first. Default is 0.
+
+        """
+        interval = self.interval if interval is None else interval
+        key = reserveId.lower()
+        with self._lock:
+            title = self._titles.get(key)
+            if title is None:
+                self._titles[key] = _TrackedTitle(interval, priority, time.monotonic())
+            else:
+                title.interval = interval
+                title.priority = priority
+
+    def unsubscribe(self, callback: AvailabilityCallback) -> None:
+        """Removes a previously registered callable."""
+        self._subscribers.remove(callback)
+
+    def untrack(self, reserveId: str) -> None:
+        """Removes a title from the working set."""
+        with self._lock:
+            self._titles.pop(reserveId.lower(), None)
@@ -2,11 +2,21 @@
 
 from __future__ import annotations
 
+import threading
+from collections.abc import Container, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import IO
+
 import requests
 
 from . import __title__, __version__
+from .archive import ResponseArchiver
 from .authorize import OverdriveAccessToken
+from .dedupe import ReserveIdBloomFilter, ReserveIdSet
+from .errors import BookopsOverdriveError
 from .query import Query
+from .ratelimit import RateLimiter
+from .resilience import CircuitBreaker, LatencyTracker
 
 
 class OverdriveSession(requests.Session):
@@ -21,6 +31,9 @@ class OverdriveSession(requests.Session):
     """
 
     COLLECTIONS_URL = "https://api.overdrive.com/v1/collections"
+    COLLECTIONS_V2_URL = "https://api.overdrive.com/v2/collections"
+    BULK_METADATA_LIMIT = 50
+    SEARCH_LIMIT = 2000
     LIBRARY_ACCOUNT_URL = "https://api.overdrive.com/v1/libraries"
 
     def __init__(
@@ -28,6 +41,11 @@ class OverdriveSession(requests.Session):
         authorization: OverdriveAccessToken,
         agent: str = f"{__title__}/{__version__}",
         timeout: int | float | tuple[int | float, int | float] | None = (5, 5),
+        hedge_percentile: float | None = None,
+        breaker_threshold: int | None = None,
+        breaker_reset_timeout: float = 30,
+        hedge_max_in_flight: int = 4,
+        rate_limiter: RateLimiter | None = None,
     ) -> None:
         """Initializes `OverdriveSession` class instance.
 
@@ -41,21 +59,97 @@ class OverdriveSession(requests.Session):
                 How many seconds to wait for the server to respond. Accepts a single
                 value to be applied to both connect and read timeouts or two separate
                 values. Default is 5 seconds for connect and read timeouts.
+            hedge_percentile:
+                Percentile (0-100) of recent response times after which a duplicate
+                request is sent by `get_title_metadata` and `get_bulk_metadata`.
+                The first response to arrive is used. Default is `None` which
+                disables hedged requests.
+            breaker_threshold:
+                Number of consecutive failed requests to an endpoint after which
+                further requests to it fail fast with `BookopsOverdriveError`.
+                Default is `None` which disables the circuit breaker.
+            breaker_reset_timeout:
+                How many seconds an open circuit waits before letting a trial
+                request through. Default is 30 seconds.
+            hedge_max_in_flight:
+                Maximum number of hedged requests in progress at the same time.
+                Requests beyond this limit are sent without hedging. Default is 4.
+            rate_limiter:
+                An object with `acquire` and `try_acquire` methods, such as
+                `FileRateLimiter`, that is called before each request is sent.
+                Processes that share one `FileRateLimiter` path share one request
+                budget. Hedged duplicates are only sent if a token is available
+                without waiting. Default is `None` which sends requests without
+                throttling.
 
         """
 
         super().__init__()
         self.authorization = authorization
+        self.breaker_reset_timeout = breaker_reset_timeout
+        self.breaker_threshold = breaker_threshold
+        self.hedge_max_in_flight = hedge_max_in_flight
+        self.hedge_percentile = hedge_percentile
+        self.rate_limiter = rate_limiter
         self.timeout = timeout
+        self._circuit_breakers: dict[str, CircuitBreaker] = {}
+        self._hedge_executor: ThreadPoolExecutor | None = None
+        self._hedge_lock = threading.Lock()
+        self._hedge_slots = threading.BoundedSemaphore(hedge_max_in_flight)
+        self._latency_trackers: dict[str, LatencyTracker] = {}
 
         self.headers.update({"User-Agent": agent})
         self.headers.update({"Authorization": f"Bearer {self.authorization.token_str}"})
 
+    def _archive_response(
+        self,
+        query: Query,
+        archiver: ResponseArchiver,
+        destination: str | IO[bytes] | None,
+    ) -> None:
+        """
+        Archives the body of a streamed response. A failure while reading the
+        body counts as a failure of the endpoint's circuit breaker.
+        """
+        try:
+            archiver.archive(query.response, destination)
+        except BookopsOverdriveError:
+            breaker = self._get_circuit_breaker(query.endpoint)
+            if breaker is not None:
+                breaker.record_failure()
+            raise
+
+    def _get_circuit_breaker(self, endpoint: str) -> CircuitBreaker | None:
+        """Returns circuit breaker for endpoint or `None` if disabled."""
+        if self.breaker_threshold is None:
+            return None
+        return self._circuit_breakers.setdefault(
+            endpoint,
+            CircuitBreaker(self.breaker_threshold, self.breaker_reset_timeout),
+        )
+
+    def _get_hedge_executor(self) -> ThreadPoolExecutor:
+        """Returns thread pool used to send hedged requests."""
+        with self._hedge_lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(
+                    max_workers=2 * self.hedge_max_in_flight,
+                    thread_name_prefix="bookops-overdrive-hedge",
+                )
+            return self._hedge_executor
+
+    def _get_latency_tracker(self, endpoint: str) -> LatencyTracker:
+        """Returns response time tracker for endpoint."""
+        return self._latency_trackers.setdefault(endpoint, LatencyTracker())
+
     def _request_new_access_token(self) -> None:
         """Requests a new token and updates headers."""
         self.authorization._request_token()
         self.headers.update({"Authorization": f"Bearer {self.authorization.token_str}"})
 
+    def _url_collections_availability(self, collectionToken: str) -> str:
+        return f"{self.COLLECTIONS_V2_URL}/{collectionToken}/availability"
+
     def _url_collections_digital_inventory(self, collectionToken: str) -> str:
         return f"{self.COLLECTIONS_URL}/{collectionToken}/digitalinventory"
 
@@ -77,6 +171,14 @@ class OverdriveSession(requests.Session):
         else:
             return ",".join([str(i.strip()) for i in reserveIds.split(",")])
 
+    def close(self) -> None:
+        """Closes adapters and stops the thread pool used for hedged requests."""
+        with self._hedge_lock:
+            if self._hedge_executor is not None:
+                self._hedge_executor.shutdown(wait=False)
+                self._hedge_executor = None
+        super().close()
+
     def get_library_account_info(self, library_id: int) -> requests.Response:
         """
         Given an Overdrive ID, retrieve information for the specified library.
@@ -94,10 +196,17 @@ class OverdriveSession(requests.Session):
         header = {"Accept": "application/json"}
         req = requests.Request("GET", url=url, headers=header)
         prepared_request = self.prepare_request(req)
-        query = Query(self, prepared_request=prepared_request)
+        query = Query(
+            self, prepared_request=prepared_request, endpoint="library_account"
+        )
         return query.response
 
-    def get_collection_inventory(self, collectionToken: str) -> requests.Response:
+    def get_collection_inventory(
+        self,
+        collectionToken: str,
+        archiver: ResponseArchiver | None = None,
+        archive_to: str | IO[bytes] | None = None,
+    ) -> requests.Response:
         """
         Given an institution's `collectionToken`, retrieve an inventory of the
         library's entire digital collection. An institution's `collectionToken`
@@ -109,19 +218,72 @@ class OverdriveSession(requests.Session):
         Args:
             collectionToken:
                 a token which identifies the the requesting institution.
+            archiver:
+                a `ResponseArchiver` object. If given, the response is requested
+                gzip-compressed and its body is written to the archive as
+                received, without being decoded. The body is then no longer
+                available from the returned response.
+            archive_to:
+                name of a new file within the archiver's directory or a writable
+                binary buffer the body is written to. Default is a file named
+                after the body's SHA-256 hash. Ignored if `archiver` is not given.
 
         Returns:
             `requests.Response` instance
         """
         url = self._url_collections_digital_inventory(collectionToken)
         header = {"Accept": "application/json"}
+        if archiver is not None:
+            header["Accept-Encoding"] = "gzip"
+            if isinstance(archive_to, str):
+                # reject a bad file name before the request is sent
+                archiver._target(archive_to)
         req = requests.Request("GET", url=url, headers=header)
         prepared_request = self.prepare_request(req)
-        query = Query(self, prepared_request=prepared_request)
+        query = Query(
+            self,
+            prepared_request=prepared_request,
+            endpoint="digital_inventory",
+            stream=archiver is not None,
+        )
+        if archiver is not None:
+            self._archive_response(query, archiver, archive_to)
         return query.response
 
-    def get_bulk_metadata(
+    def get_bulk_availability(
         self, collectionToken: str, reserveIds: str | list[str]
+    ) -> requests.Response:
+        """
+        Retrieve availability (copies owned, copies available and number of holds)
+        for up to 25 titles by `reserveId`.
+
+        Uses `/v2/collections/{collectionToken}/availability` endpoint.
+
+        Args:
+            collectionToken:
+                a token which identifies the the requesting institution.
+            reserveIds:
+                string or list containing one or more reserveIds.
+                If str, the ids must be separated by a comma.
+
+        Returns:
+            `requests.Response` instance
+
+        """
+        url = self._url_collections_availability(collectionToken)
+        header = {"Accept": "application/json"}
+        payload = {"products": self._verify_reserve_ids(reserveIds=reserveIds)}
+        req = requests.Request("GET", url=url, headers=header, params=payload)
+        prepared_request = self.prepare_request(req)
+        query = Query(self, prepared_request=prepared_request, endpoint="availability")
+        return query.response
+
+    def get_bulk_metadata(
+        self,
+        collectionToken: str,
+        reserveIds: str | list[str],
+        archiver: ResponseArchiver | None = None,
+        archive_to: str | IO[bytes] | None = None,
     ) -> requests.Response:
         """
         Retrieve metadata for up to 50 titles by `reserveId` or `crossRefId`.
@@ -134,6 +296,16 @@ class OverdriveSession(requests.Session):
             reserveIds:
                 string or list containing one or more reserveIds or crossRefIds.
                 If str, the ids must be separated by a comma.
+            archiver:
+                a `ResponseArchiver` object. If given, the response is requested
+                gzip-compressed and its body is written to the archive as
+                received, without being decoded. The body is then no longer
+                available from the returned response. Archived requests are
+                never hedged.
+            archive_to:
+                name of a new file within the archiver's directory or a writable
+                binary buffer the body is written to. Default is a file named
+                after the body's SHA-256 hash. Ignored if `archiver` is not given.
 
         Returns:
             `requests.Response` instance
@@ -141,10 +313,23 @@ class OverdriveSession(requests.Session):
         """
         url = self._url_collections_bulk_metadata(collectionToken)
         header = {"Accept": "application/json"}
+        if archiver is not None:
+            header["Accept-Encoding"] = "gzip"
+            if isinstance(archive_to, str):
+                # reject a bad file name before the request is sent
+                archiver._target(archive_to)
         payload = {"reserveIds": self._verify_reserve_ids(reserveIds=reserveIds)}
         req = requests.Request("GET", url=url, headers=header, params=payload)
         prepared_request = self.prepare_request(req)
-        query = Query(self, prepared_request=prepared_request)
+        query = Query(
+            self,
+            prepared_request=prepared_request,
+            endpoint="bulk_metadata",
+            hedge=archiver is None,
+            stream=archiver is not None,
+        )
+        if archiver is not None:
+            self._archive_response(query, archiver, archive_to)
         return query.response
 
     def get_title_metadata(
@@ -169,7 +354,12 @@ class OverdriveSession(requests.Session):
         header = {"Accept": "application/json"}
         req = requests.Request("GET", url=url, headers=header)
         prepared_request = self.prepare_request(req)
-        query = Query(self, prepared_request=prepared_request)
+        query = Query(
+            self,
+            prepared_request=prepared_request,
+            endpoint="title_metadata",
+            hedge=True,
+        )
         return query.response
 
     def search_title_metadata(
@@ -261,5 +451,137 @@ class OverdriveSession(requests.Session):
         }
         req = requests.Request("GET", url=url, headers=header, params=payload)
         prepared_request = self.prepare_request(req)
-        query = Query(self, prepared_request=prepared_request)
+        query = Query(self, prepared_request=prepared_request, endpoint="search")
         return query.response
+
+    def iter_reserve_ids(
+        self,
+        collectionToken: str,
+        q: str = "",
+        availability: bool = False,
+        formats: str | list[str] | None = None,
+        lastUpdateTime: str | None = None,
+        limit: int = SEARCH_LIMIT,
+        seen: ReserveIdSet | ReserveIdBloomFilter | None = None,
+    ) -> Iterator[str]:
+        """
+        Enumerate reserveIds of titles within an institution's digital collection.
+        Pages through `search_title_metadata` with `minimum=True` so that only
+        the reserveId of each title is transferred. Titles repeated across page
+        boundaries are yielded only once.
+
+        Args:
+            collectionToken:
+                A token which identifies the the requesting institution.
+            q:
+                Terms to include in search query. Default is an empty query
+                which matches all titles.
+            availability:
+                Whether to include only titles currently available to borrow.
+                Default is `False`.
+            formats:
+                String or list containing formats to be included in search. If str,
+                the formats must be separated by a comma.
+            lastUpdateTime:
+                Include only records updated after this date. Date should be
+                formatted as YYYY-MM-DD.
+            limit:
+                The number of reserveIds requested per page. Default and maximum
+                is 2000.
+            seen:
+                `ReserveIdSet` or `ReserveIdBloomFilter` used to skip reserveIds
+                that were already yielded. Passing the same object to several
+                calls de-duplicates across them. Default is a new `ReserveIdSet`.
+                A `ReserveIdBloomFilter` uses less memory but its false positives
+                silently drop titles that were never yielded, so use it only
+                when an incomplete result is acceptable.
+
+        Yields:
+            reserveId of each title as a str
+        """
+        if seen is None:
+            seen = ReserveIdSet()
+        offset = 0
+        while True:
+            response = self.search_title_metadata(
+                collectionToken,
+                q=q,
+                availability=availability,
+                formats=formats,
+                lastUpdateTime=lastUpdateTime,
+                limit=limit,
+                minimum=True,
+                offset=str(offset),
+            )
+            data = response.json()
+            products = data.get("products") or []
+            for product in products:
+                reserveId = product.get("id") or product.get("reserveId")
+                if reserveId and seen.add(reserveId):
+                    yield reserveId
+            offset += len(products)
+            if not products or offset >= data.get("totalItems", 0):
+                break
+
+    def harvest_title_metadata(
+        self,
+        collectionToken: str,
+        fresh: Container[str] = frozenset(),
+        q: str = "",
+        availability: bool = False,
+        formats: str | list[str] | None = None,
+        lastUpdateTime: str | None = None,
+        seen: ReserveIdSet | ReserveIdBloomFilter | None = None,
+    ) -> Iterator[requests.Response]:
+        """
+        Harvest metadata for titles in an institution's digital collection in two
+        phases. First the reserveIds of matching titles are enumerated cheaply
+        using `iter_reserve_ids`. Then full metadata is retrieved with
+        `get_bulk_metadata`, 50 titles at a time, only for titles whose
+        reserveId is not in `fresh`.
+
+        Args:
+            collectionToken:
+                A token which identifies the the requesting institution.
+            fresh:
+                reserveIds of titles for which the caller already has current
+                metadata. These titles are skipped. Default is an empty set.
+            q:
+                Terms to include in search query. Default is an empty query
+                which matches all titles.
+            availability:
+                Whether to include only titles currently available to borrow.
+                Default is `False`.
+            formats:
+                String or list containing formats to be included in search. If str,
+                the formats must be separated by a comma.
+            lastUpdateTime:
+                Include only records updated after this date. Date should be
+                formatted as YYYY-MM-DD.
+            seen:
+                `ReserveIdSet` or `ReserveIdBloomFilter` used to skip titles
+                repeated across search pages. Default is a new `ReserveIdSet`.
+                With a `ReserveIdBloomFilter`, a false positive silently leaves
+                a new or stale title out of the harvest, so use it only when an
+                incomplete harvest is acceptable.
+
+        Yields:
+            `requests.Response` instance for each `get_bulk_metadata` request
+        """
+        batch: list[str] = []
+        for reserveId in self.iter_reserve_ids(
+            collectionToken,
+            q=q,
+            availability=availability,
+            formats=formats,
+            lastUpdateTime=lastUpdateTime,
+            seen=seen,
+        ):
+            if reserveId in fresh:
+                continue
+            batch.append(reserveId)
+            if len(batch) == self.BULK_METADATA_LIMIT:
+                yield self.get_bulk_metadata(collectionToken, reserveIds=batch)
+                batch = []
+        if batch:
+            yield self.get_bulk_metadata(collectionToken, reserveIds=batch)
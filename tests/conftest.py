@@ -7,6 +7,7 @@ import os
 import pytest
 from requests import Response
 from requests.exceptions import ConnectionError
+from requests.structures import CaseInsensitiveDict
 
 from bookops_overdrive import OverdriveAccessToken, OverdriveSession
 
@@ -36,7 +37,12 @@ def mock_now(monkeypatch) -> None:
 
 
 class MockHTTPResponse(Response):
-    REASON = {"200": "OK", "401": "Unauthorized", "404": "Not Found"}
+    REASON = {
+        "200": "OK",
+        "401": "Unauthorized",
+        "404": "Not Found",
+        "500": "Internal Server Error",
+    }
 
     def __init__(self, http_code: int, content: bytes | None = None) -> None:
         self.status_code = http_code
@@ -44,6 +50,10 @@ class MockHTTPResponse(Response):
         self.url = "https://foo.bar?query"
         self._content = content if content else b""
         self.encoding = "utf-8"
+        self.headers = CaseInsensitiveDict()
+        self.raw = None
+        self.request = None
+        self._content_consumed = True
 
 
 @pytest.fixture
@@ -104,4 +114,13 @@ def mock_connection_error(monkeypatch) -> None:
 
 @pytest.fixture
 def stub_session(mock_token):
-    yield OverdriveSession(authorization=mock_token)
+    with OverdriveSession(authorization=mock_token) as session:
+        yield session
+
+
+@pytest.fixture
+def hedged_session(mock_token):
+    with OverdriveSession(authorization=mock_token, hedge_percentile=90) as session:
+        for _ in range(20):
+            session._get_latency_tracker("foo").record(0.01)
+        yield session
@@ -0,0 +1,250 @@
+import gzip
+import hashlib
+import io
+import json
+
+import pytest
+from requests import Request
+from urllib3.exceptions import ProtocolError
+from urllib3.response import HTTPResponse
+
+from bookops_overdrive import OverdriveSession, ResponseArchiver
+from bookops_overdrive.errors import BookopsOverdriveError
+
+from .conftest import MockHTTPResponse
+
+BODY = json.dumps({"products": [{"id": "foo"}] * 100}).encode()
+GZIPPED = gzip.compress(BODY)
+REQUEST = Request("GET", url="https://foo", headers={"Accept-Encoding": "gzip"})
+
+
+@pytest.fixture
+def mock_gzip_response(monkeypatch):
+    sent = []
+
+    def mock_api_response(session, prepared_request, **kwargs):
+        sent.append((prepared_request, kwargs))
+        response = MockHTTPResponse(http_code=200)
+        response.headers["Content-Encoding"] = "gzip"
+        response.headers["Content-Type"] = "application/json"
+        response.raw = HTTPResponse(
+            body=io.BytesIO(GZIPPED),
+            headers={"Content-Encoding": "gzip"},
+            preload_content=False,
+        )
+        response._content = False
+        response._content_consumed = False
+        response.request = prepared_request
+        response.url = prepared_request.url
+        return response
+
+    monkeypatch.setattr("requests.Session.send", mock_api_response)
+    return sent
+
+
+def read_manifest(archiver):
+    with open(archiver.manifest, encoding="utf-8") as fh:
+        return [json.loads(line) for line in fh]
+
+
+class TestResponseArchiver:
+    def test_archiver(self, tmp_path):
+        archiver = ResponseArchiver(str(tmp_path / "archive"), chunk_size=1024)
+        assert (tmp_path / "archive").is_dir()
+        assert archiver.manifest == str(tmp_path / "archive" / "manifest.jsonl")
+
+    def test_get_collection_inventory(self, stub_session, mock_gzip_response, tmp_path):
+        archiver = ResponseArchiver(str(tmp_path), chunk_size=64)
+        response = stub_session.get_collection_inventory("foo", archiver=archiver)
+        assert response.status_code == 200
+        prepared_request, kwargs = mock_gzip_response[0]
+        assert prepared_request.headers["Accept-Encoding"] == "gzip"
+        assert kwargs["stream"] is True
+
+        entry = read_manifest(archiver)[0]
+        sha256 = hashlib.sha256(GZIPPED).hexdigest()
+        assert entry["file"] == f"{sha256}.json.gz"
+        assert entry["bytes"] == len(GZIPPED)
+        assert entry["sha256"] == sha256
+        assert entry["content_encoding"] == "gzip"
+        assert entry["content_type"] == "application/json"
+        assert entry["method"] == "GET"
+        assert entry["status_code"] == 200
+        assert (tmp_path / entry["file"]).read_bytes() == GZIPPED
+        assert gzip.decompress((tmp_path / entry["file"]).read_bytes()) == BODY
+        assert [p.name for p in tmp_path.glob("*.part")] == []
+
+    def test_get_bulk_metadata(self, mock_token, mock_gzip_response, tmp_path):
+        with OverdriveSession(authorization=mock_token, hedge_percentile=0) as session:
+            for _ in range(20):
+                session._get_latency_tracker("bulk_metadata").record(0)
+            archiver = ResponseArchiver(str(tmp_path))
+            session.get_bulk_metadata("foo", reserveIds="a,b", archiver=archiver)
+            session.get_bulk_metadata("foo", reserveIds="a,b", archiver=archiver)
+            assert len(mock_gzip_response) == 2
+            entries = read_manifest(archiver)
+            assert len(entries) == 2
+            assert "reserveIds=a%2Cb" in entries[0]["url"]
+
+    def test_archive_named_file(self, stub_session, mock_gzip_response, tmp_path):
+        archiver = ResponseArchiver(str(tmp_path))
+        response = stub_session.send(stub_session.prepare_request(REQUEST))
+        entry = archiver.archive(response, destination="inventory.json.gz")
+        assert entry["file"] == "inventory.json.gz"
+        assert (tmp_path / "inventory.json.gz").read_bytes() == GZIPPED
+
+    def test_archive_buffer(self, stub_session, mock_gzip_response, tmp_path):
+        archiver = ResponseArchiver(str(tmp_path))
+        response = stub_session.send(stub_session.prepare_request(REQUEST))
+        buffer = io.BytesIO()
+        entry = archiver.archive(response, destination=buffer)
+        assert entry["file"] is None
+        assert buffer.getvalue() == GZIPPED
+        assert read_manifest(archiver) == [entry]
+
+    @pytest.mark.parametrize("name", ["", "..", "../escape.json", "sub/file.json"])
+    def test_archive_invalid_name(
+        self, stub_session, mock_gzip_response, tmp_path, name
+    ):
+        archiver = ResponseArchiver(str(tmp_path / "archive"))
+        response = stub_session.send(stub_session.prepare_request(REQUEST))
+        with pytest.raises(BookopsOverdriveError) as exc:
+            archiver.archive(response, destination=name)
+        assert "Invalid archive file name" in str(exc.value)
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["archive"]
+        assert list((tmp_path / "archive").iterdir()) == []
+
+    def test_archive_absolute_name(self, stub_session, mock_gzip_response, tmp_path):
+        archiver = ResponseArchiver(str(tmp_path / "archive"))
+        response = stub_session.send(stub_session.prepare_request(REQUEST))
+        with pytest.raises(BookopsOverdriveError) as exc:
+            archiver.archive(response, destination=str(tmp_path / "escape.json"))
+        assert "Invalid archive file name" in str(exc.value)
+        assert not (tmp_path / "escape.json").exists()
+
+    def test_archive_existing_file(self, stub_session, mock_gzip_response, tmp_path):
+        (tmp_path / "inventory.json.gz").write_bytes(b"keep")
+        archiver = ResponseArchiver(str(tmp_path))
+        response = stub_session.send(stub_session.prepare_request(REQUEST))
+        with pytest.raises(BookopsOverdriveError) as exc:
+            archiver.archive(response, destination="inventory.json.gz")
+        assert "Archive file 'inventory.json.gz' already exists." in str(exc.value)
+        assert (tmp_path / "inventory.json.gz").read_bytes() == b"keep"
+        assert not (tmp_path / "manifest.jsonl").exists()
+
+    def test_get_collection_inventory_invalid_archive_to(
+        self, stub_session, mock_gzip_response, tmp_path
+    ):
+        archiver = ResponseArchiver(str(tmp_path))
+        with pytest.raises(BookopsOverdriveError):
+            stub_session.get_collection_inventory(
+                "foo", archiver=archiver, archive_to="../escape.json"
+            )
+        assert mock_gzip_response == []
+
+    @pytest.mark.parametrize("encoding,suffix", [(None, ".json"), ("br", ".json.br")])
+    def test_suffix(self, tmp_path, encoding, suffix):
+        response = MockHTTPResponse(http_code=200)
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        assert ResponseArchiver(str(tmp_path))._suffix(response) == suffix
+
+    def test_archive_consumed_response(self, tmp_path):
+        archiver = ResponseArchiver(str(tmp_path))
+        response = MockHTTPResponse(http_code=200, content=b"{}")
+        response._content_consumed = True
+        with pytest.raises(BookopsOverdriveError) as exc:
+            archiver.archive(response)
+        assert "Response body is not available for archiving." in str(exc.value)
+        assert list(tmp_path.glob("*.part")) == []
+        assert not (tmp_path / "manifest.jsonl").exists()
+
+    def test_get_collection_inventory_archive_to_buffer(
+        self, stub_session, mock_gzip_response, tmp_path
+    ):
+        archiver = ResponseArchiver(str(tmp_path))
+        buffer = io.BytesIO()
+        stub_session.get_collection_inventory(
+            "foo", archiver=archiver, archive_to=buffer
+        )
+        assert buffer.getvalue() == GZIPPED
+        assert read_manifest(archiver)[0]["file"] is None
+
+    def test_get_bulk_metadata_archive_to_file(
+        self, stub_session, mock_gzip_response, tmp_path
+    ):
+        archiver = ResponseArchiver(str(tmp_path))
+        stub_session.get_bulk_metadata(
+            "foo", reserveIds="a", archiver=archiver, archive_to="bulk.json.gz"
+        )
+        assert (tmp_path / "bulk.json.gz").read_bytes() == GZIPPED
+        assert len(stub_session._get_latency_tracker("bulk_metadata")) == 0
+
+    def test_archive_read_error(self, mock_token, monkeypatch, tmp_path):
+        class BrokenRaw:
+            def close(self):
+                pass
+
+            def stream(self, *args, **kwargs):
+                yield b"foo"
+                raise ProtocolError("Connection broken")
+
+        def mock_api_response(session, prepared_request, **kwargs):
+            response = MockHTTPResponse(http_code=200)
+            response.raw = BrokenRaw()
+            response._content_consumed = False
+            return response
+
+        monkeypatch.setattr("requests.Session.send", mock_api_response)
+        with OverdriveSession(authorization=mock_token, breaker_threshold=1) as session:
+            archiver = ResponseArchiver(str(tmp_path))
+            with pytest.raises(BookopsOverdriveError) as exc:
+                session.get_collection_inventory("foo", archiver=archiver)
+            assert "Error reading response body: ProtocolError" in str(exc.value)
+            assert session._get_circuit_breaker("digital_inventory").state == "open"
+            assert list(tmp_path.glob("*.part")) == []
+
+    def test_archive_read_error_no_breaker(self, stub_session, monkeypatch, tmp_path):
+        class BrokenRaw:
+            def close(self):
+                pass
+
+            def stream(self, *args, **kwargs):
+                raise ProtocolError("Connection broken")
+
+        def mock_api_response(session, prepared_request, **kwargs):
+            response = MockHTTPResponse(http_code=200)
+            response.raw = BrokenRaw()
+            response._content_consumed = False
+            return response
+
+        monkeypatch.setattr("requests.Session.send", mock_api_response)
+        with pytest.raises(BookopsOverdriveError):
+            stub_session.get_bulk_metadata(
+                "foo", "a", archiver=ResponseArchiver(str(tmp_path))
+            )
+
+    def test_archive_http_error_unreadable_body(
+        self, stub_session, monkeypatch, tmp_path
+    ):
+        class TruncatedRaw:
+            def close(self):
+                pass
+
+            def stream(self, *args, **kwargs):
+                yield b"Service"
+                raise ProtocolError("Connection broken: IncompleteRead")
+
+        def mock_api_response(session, prepared_request, **kwargs):
+            response = MockHTTPResponse(http_code=500)
+            response.raw = TruncatedRaw()
+            response._content = False
+            response._content_consumed = False
+            return response
+
+        monkeypatch.setattr("requests.Session.send", mock_api_response)
+        archiver = ResponseArchiver(str(tmp_path))
+        with pytest.raises(BookopsOverdriveError) as exc:
+            stub_session.get_collection_inventory("foo", archiver=archiver)
+        assert "500 Server Error" in str(exc.value)
+        assert "Server response: <unreadable body>" in str(exc.value)
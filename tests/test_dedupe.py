@@ -0,0 +1,68 @@
+import uuid
+
+import pytest
+
+from bookops_overdrive import ReserveIdBloomFilter, ReserveIdSet
+
+
+@pytest.fixture
+def reserve_ids():
+    return [str(uuid.UUID(int=i * 7919 + 1)) for i in range(5000)]
+
+
+class TestReserveIdSet:
+    def test_add(self, reserve_ids):
+        seen = ReserveIdSet(capacity=10)
+        assert all(seen.add(i) for i in reserve_ids)
+        assert not any(seen.add(i) for i in reserve_ids)
+        assert len(seen) == 5000
+        assert all(i in seen for i in reserve_ids)
+        assert str(uuid.UUID(int=2)) not in seen
+
+    def test_case_insensitive(self):
+        seen = ReserveIdSet()
+        reserveId = "76c1b7d0-17f4-4c05-8397-c66c17411584"
+        assert seen.add(reserveId.upper()) is True
+        assert seen.add(reserveId) is False
+        assert reserveId in seen
+
+    def test_nil_uuid(self):
+        seen = ReserveIdSet()
+        nil = str(uuid.UUID(int=0))
+        assert nil not in seen
+        assert seen.add(nil) is True
+        assert seen.add(nil) is False
+        assert nil in seen
+        assert len(seen) == 1
+
+    def test_not_guid(self):
+        seen = ReserveIdSet()
+        assert seen.add("12345") is True
+        assert seen.add("12345") is False
+        assert "12345" in seen
+        assert 12345 not in seen
+        assert len(seen) == 1
+
+
+class TestReserveIdBloomFilter:
+    def test_add(self, reserve_ids):
+        seen = ReserveIdBloomFilter(capacity=5000, error_rate=0.01)
+        assert sum(seen.add(i) for i in reserve_ids) > 4900
+        assert not any(seen.add(i) for i in reserve_ids)
+        assert all(i in seen for i in reserve_ids)
+        assert len(seen) > 4900
+        assert len(seen._bits) < 16 * 5000
+
+    def test_false_positive_rate(self, reserve_ids):
+        seen = ReserveIdBloomFilter(capacity=5000, error_rate=0.01)
+        for i in reserve_ids:
+            seen.add(i)
+        others = [str(uuid.uuid4()) for _ in range(5000)]
+        assert sum(i in seen for i in others) < 150
+
+    def test_not_guid(self):
+        seen = ReserveIdBloomFilter(capacity=0)
+        assert seen.capacity == 1
+        assert seen.hash_count >= 1
+        assert seen.add("12345") is True
+        assert "12345" in seen
@@ -0,0 +1,118 @@
+import json
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from bookops_overdrive import ReserveIdBloomFilter, ReserveIdSet
+
+from .conftest import MockHTTPResponse
+
+
+@pytest.fixture
+def mock_collection(monkeypatch):
+    ids = [f"id{i}" for i in range(120)]
+    requests_sent = []
+
+    def mock_api_response(session, prepared_request, **kwargs):
+        url = urlsplit(prepared_request.url)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        requests_sent.append((url.path, params))
+        if url.path.endswith("/bulkmetadata"):
+            metadata = [{"id": i} for i in params["reserveIds"].split(",")]
+            content = {"metadata": metadata}
+        else:
+            offset = int(params["offset"])
+            limit = int(params["limit"])
+            products = [{"id": i} for i in ids[offset : offset + limit]]
+            content = {"products": products, "totalItems": len(ids)}
+        return MockHTTPResponse(http_code=200, content=json.dumps(content).encode())
+
+    monkeypatch.setattr("requests.Session.send", mock_api_response)
+    return requests_sent
+
+
+class TestHarvest:
+    def test_iter_reserve_ids(self, stub_session, mock_collection):
+        ids = list(stub_session.iter_reserve_ids("foo", limit=50))
+        assert ids == [f"id{i}" for i in range(120)]
+        assert [p["offset"] for _, p in mock_collection] == ["0", "50", "100"]
+        assert all(p["minimum"] == "True" for _, p in mock_collection)
+        assert all(p["availability"] == "False" for _, p in mock_collection)
+
+    def test_iter_reserve_ids_capped_page_size(self, stub_session, monkeypatch):
+        offsets = []
+
+        def mock_api_response(session, prepared_request, **kwargs):
+            params = parse_qs(urlsplit(prepared_request.url).query)
+            offset = int(params["offset"][0])
+            offsets.append(offset)
+            products = [{"id": f"id{i}"} for i in range(offset, min(offset + 30, 120))]
+            content = {"products": products, "totalItems": 120}
+            return MockHTTPResponse(200, content=json.dumps(content).encode())
+
+        monkeypatch.setattr("requests.Session.send", mock_api_response)
+        ids = list(stub_session.iter_reserve_ids("foo", limit=100))
+        assert ids == [f"id{i}" for i in range(120)]
+        assert offsets == [0, 30, 60, 90]
+
+    def test_iter_reserve_ids_exact_page(self, stub_session, mock_collection):
+        ids = list(stub_session.iter_reserve_ids("foo", limit=60))
+        assert len(ids) == 120
+        assert len(mock_collection) == 2
+
+    @pytest.mark.parametrize(
+        "content,expected",
+        [
+            ({}, []),
+            ({"products": [{"reserveId": "a"}, {}], "totalItems": 2}, ["a"]),
+        ],
+    )
+    def test_iter_reserve_ids_response_shape(
+        self, stub_session, monkeypatch, content, expected
+    ):
+        def mock_api_response(*args, **kwargs):
+            return MockHTTPResponse(200, content=json.dumps(content).encode())
+
+        monkeypatch.setattr("requests.Session.send", mock_api_response)
+        assert list(stub_session.iter_reserve_ids("foo")) == expected
+
+    @pytest.mark.parametrize(
+        "seen", [None, ReserveIdSet(), ReserveIdBloomFilter(capacity=100)]
+    )
+    def test_iter_reserve_ids_dedupe(self, stub_session, monkeypatch, seen):
+        pages = [["a", "b"], ["b", "c"], ["c"]]
+
+        def mock_api_response(session, prepared_request, **kwargs):
+            products = [{"id": i} for i in pages.pop(0)]
+            content = {"products": products, "totalItems": 5}
+            return MockHTTPResponse(200, content=json.dumps(content).encode())
+
+        monkeypatch.setattr("requests.Session.send", mock_api_response)
+        ids = list(stub_session.iter_reserve_ids("foo", limit=2, seen=seen))
+        assert ids == ["a", "b", "c"]
+
+    def test_harvest_title_metadata_shared_seen(self, stub_session, mock_collection):
+        seen = ReserveIdSet()
+        first = list(stub_session.harvest_title_metadata("foo", seen=seen))
+        second = list(stub_session.harvest_title_metadata("foo", seen=seen))
+        assert len(first) == 3
+        assert second == []
+        assert len(seen) == 120
+
+    def test_harvest_title_metadata(self, stub_session, mock_collection):
+        fresh = {f"id{i}" for i in range(0, 120, 2)}
+        responses = list(stub_session.harvest_title_metadata("foo", fresh=fresh))
+        harvested = [m["id"] for r in responses for m in r.json()["metadata"]]
+        assert harvested == [f"id{i}" for i in range(1, 120, 2)]
+        assert [len(r.json()["metadata"]) for r in responses] == [50, 10]
+        assert mock_collection[0][1]["limit"] == "2000"
+
+    def test_harvest_title_metadata_all_fresh(self, stub_session, mock_collection):
+        fresh = {f"id{i}" for i in range(120)}
+        assert list(stub_session.harvest_title_metadata("foo", fresh=fresh)) == []
+        assert len(mock_collection) == 1
+
+    def test_harvest_title_metadata_full_batches(self, stub_session, mock_collection):
+        fresh = {f"id{i}" for i in range(100, 120)}
+        responses = list(stub_session.harvest_title_metadata("foo", fresh=fresh))
+        assert [len(r.json()["metadata"]) for r in responses] == [50, 50]
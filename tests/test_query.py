@@ -1,9 +1,15 @@
+import time
+
 import pytest
 from requests import Request
+from requests.exceptions import ChunkedEncodingError, ConnectionError
 
+from bookops_overdrive import OverdriveSession
 from bookops_overdrive.errors import BookopsOverdriveError
 from bookops_overdrive.query import Query
 
+from .conftest import MockHTTPResponse
+
 
 def test_query(stub_session, mock_session_response):
     req = Request("GET", url="https://foo", headers={"Accept": "application/json"})
@@ -27,3 +33,237 @@ def test_query_http_error(stub_session, mock_session_response):
     with pytest.raises(BookopsOverdriveError) as exc:
         Query(stub_session, prepared_request)
     assert "404 Client Error: Not Found for url: " in str(exc.value)
+
+
+def test_query_endpoint_default(stub_session, mock_session_response):
+    req = Request("GET", url="https://foo/bar?baz=1")
+    prepared_request = stub_session.prepare_request(req)
+    query = Query(stub_session, prepared_request)
+    assert query.endpoint == "/bar"
+    assert len(stub_session._get_latency_tracker("/bar")) == 1
+
+
+@pytest.mark.http_code(500)
+def test_query_circuit_breaker_open(mock_token, mock_session_response):
+    with OverdriveSession(authorization=mock_token, breaker_threshold=2) as session:
+        req = Request("GET", url="https://foo", headers={"Accept": "application/json"})
+        prepared_request = session.prepare_request(req)
+        for _ in range(2):
+            with pytest.raises(BookopsOverdriveError) as exc:
+                Query(session, prepared_request, endpoint="foo")
+            assert "500 Server Error" in str(exc.value)
+        with pytest.raises(BookopsOverdriveError) as exc:
+            Query(session, prepared_request, endpoint="foo")
+        assert "Circuit breaker open for 'foo' endpoint" in str(exc.value)
+        assert session._get_circuit_breaker("bar").state == "closed"
+
+
+def test_query_circuit_breaker_connection_error(mock_token, mock_connection_error):
+    with OverdriveSession(authorization=mock_token, breaker_threshold=1) as session:
+        req = Request("GET", url="https://foo", headers={"Accept": "application/json"})
+        prepared_request = session.prepare_request(req)
+        with pytest.raises(BookopsOverdriveError):
+            Query(session, prepared_request, endpoint="foo")
+        assert session._get_circuit_breaker("foo").state == "open"
+
+
+@pytest.mark.http_code(404)
+def test_query_circuit_breaker_client_error(mock_token, mock_session_response):
+    with OverdriveSession(authorization=mock_token, breaker_threshold=1) as session:
+        req = Request("GET", url="https://foo", headers={"Accept": "application/json"})
+        prepared_request = session.prepare_request(req)
+        with pytest.raises(BookopsOverdriveError):
+            Query(session, prepared_request, endpoint="foo")
+        assert session._get_circuit_breaker("foo").state == "closed"
+
+
+def test_query_circuit_breaker_success(mock_token, mock_session_response):
+    with OverdriveSession(authorization=mock_token, breaker_threshold=1) as session:
+        req = Request("GET", url="https://foo", headers={"Accept": "application/json"})
+        prepared_request = session.prepare_request(req)
+        session._get_circuit_breaker("foo").failures = 5
+        Query(session, prepared_request, endpoint="foo")
+        assert session._get_circuit_breaker("foo").failures == 0
+
+
+def test_query_hedged_duplicate_sent(hedged_session, monkeypatch):
+    calls = []
+
+    def send(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 1:
+            time.sleep(0.5)
+            return MockHTTPResponse(http_code=404)
+        return MockHTTPResponse(http_code=200)
+
+    monkeypatch.setattr("requests.Session.send", send)
+    req = Request("GET", url="https://foo", headers={"Accept": "application/json"})
+    prepared_request = hedged_session.prepare_request(req)
+    query = Query(hedged_session, prepared_request, endpoint="foo", hedge=True)
+    assert query.response.status_code == 200
+    assert len(calls) == 2
+
+
+def test_query_hedged_fast_response(hedged_session, mock_session_response):
+    req = Request("GET", url="https://foo", headers={"Accept": "application/json"})
+    prepared_request = hedged_session.prepare_request(req)
+    query = Query(hedged_session, prepared_request, endpoint="foo", hedge=True)
+    assert query.response.status_code == 200
+    assert len(hedged_session._get_latency_tracker("foo")) == 21
+
+
+def test_query_hedged_no_latency_history(mock_token, mock_session_response):
+    with OverdriveSession(authorization=mock_token, hedge_percentile=90) as session:
+        req = Request("GET", url="https://foo", headers={"Accept": "application/json"})
+        prepared_request = session.prepare_request(req)
+        query = Query(session, prepared_request, endpoint="foo", hedge=True)
+        assert query.response.status_code == 200
+
+
+def test_query_hedged_first_fails(hedged_session, monkeypatch):
+    calls = []
+
+    def send(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 1:
+            time.sleep(0.2)
+            raise ConnectionError
+        time.sleep(0.5)
+        return MockHTTPResponse(http_code=200)
+
+    monkeypatch.setattr("requests.Session.send", send)
+    req = Request("GET", url="https://foo", headers={"Accept": "application/json"})
+    prepared_request = hedged_session.prepare_request(req)
+    query = Query(hedged_session, prepared_request, endpoint="foo", hedge=True)
+    assert query.response.status_code == 200
+
+
+def test_query_hedged_both_fail(hedged_session, monkeypatch):
+    def send(*args, **kwargs):
+        time.sleep(0.1)
+        raise ConnectionError
+
+    monkeypatch.setattr("requests.Session.send", send)
+    req = Request("GET", url="https://foo", headers={"Accept": "application/json"})
+    prepared_request = hedged_session.prepare_request(req)
+    with pytest.raises(BookopsOverdriveError) as exc:
+        Query(hedged_session, prepared_request, endpoint="foo", hedge=True)
+    assert "Error connecting: " in str(exc.value)
+
+
+def test_query_circuit_breaker_other_request_exception(mock_token, monkeypatch):
+    calls = []
+
+    def send(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 1:
+            raise ConnectionError
+        if len(calls) == 2:
+            raise ChunkedEncodingError
+        return MockHTTPResponse(http_code=200)
+
+    monkeypatch.setattr("requests.Session.send", send)
+    with OverdriveSession(
+        authorization=mock_token, breaker_threshold=1, breaker_reset_timeout=0
+    ) as session:
+        req = Request("GET", url="https://foo", headers={"Accept": "application/json"})
+        prepared_request = session.prepare_request(req)
+        with pytest.raises(BookopsOverdriveError):
+            Query(session, prepared_request, endpoint="foo")
+        with pytest.raises(BookopsOverdriveError) as exc:
+            Query(session, prepared_request, endpoint="foo")
+        assert "Error sending request: ChunkedEncodingError" in str(exc.value)
+        breaker = session._get_circuit_breaker("foo")
+        assert breaker._trial_in_flight is False
+        query = Query(session, prepared_request, endpoint="foo")
+        assert query.response.status_code == 200
+        assert breaker.state == "closed"
+
+
+def test_query_circuit_breaker_token_error(mock_expired_token, monkeypatch):
+    with OverdriveSession(
+        authorization=mock_expired_token, breaker_threshold=1, breaker_reset_timeout=0
+    ) as session:
+        breaker = session._get_circuit_breaker("foo")
+        breaker.record_failure()
+
+        def token_error(*args, **kwargs):
+            raise BookopsOverdriveError("Error connecting: token")
+
+        monkeypatch.setattr(session, "_request_new_access_token", token_error)
+        req = Request("GET", url="https://foo", headers={"Accept": "application/json"})
+        prepared_request = session.prepare_request(req)
+        with pytest.raises(BookopsOverdriveError):
+            Query(session, prepared_request, endpoint="foo")
+        assert breaker.state == "half-open"
+        assert breaker.allow_request() is True
+
+
+def test_query_hedged_circuit_not_closed(mock_token, monkeypatch):
+    calls = []
+
+    def send(*args, **kwargs):
+        calls.append(1)
+        time.sleep(0.1)
+        return MockHTTPResponse(http_code=200)
+
+    monkeypatch.setattr("requests.Session.send", send)
+    with OverdriveSession(
+        authorization=mock_token,
+        hedge_percentile=0,
+        breaker_threshold=1,
+        breaker_reset_timeout=0,
+    ) as session:
+        for _ in range(20):
+            session._get_latency_tracker("foo").record(0)
+        session._get_circuit_breaker("foo").record_failure()
+        req = Request("GET", url="https://foo", headers={"Accept": "application/json"})
+        Query(session, session.prepare_request(req), endpoint="foo", hedge=True)
+        assert len(calls) == 1
+
+
+def test_query_hedged_no_free_slot(hedged_session, monkeypatch):
+    calls = []
+
+    def send(*args, **kwargs):
+        calls.append(1)
+        time.sleep(0.1)
+        return MockHTTPResponse(http_code=200)
+
+    monkeypatch.setattr("requests.Session.send", send)
+    for _ in range(hedged_session.hedge_max_in_flight):
+        hedged_session._hedge_slots.acquire()
+    req = Request("GET", url="https://foo", headers={"Accept": "application/json"})
+    prepared_request = hedged_session.prepare_request(req)
+    Query(hedged_session, prepared_request, endpoint="foo", hedge=True)
+    assert len(calls) == 1
+    assert hedged_session._hedge_executor is None
+
+
+def test_query_hedged_slot_released(hedged_session, monkeypatch):
+    def send(*args, **kwargs):
+        time.sleep(0.1)
+        return MockHTTPResponse(http_code=200)
+
+    monkeypatch.setattr("requests.Session.send", send)
+    req = Request("GET", url="https://foo", headers={"Accept": "application/json"})
+    prepared_request = hedged_session.prepare_request(req)
+    Query(hedged_session, prepared_request, endpoint="foo", hedge=True)
+    time.sleep(0.2)
+    for _ in range(hedged_session.hedge_max_in_flight):
+        assert hedged_session._hedge_slots.acquire(blocking=False) is True
+    executor = hedged_session._hedge_executor
+    hedged_session.close()
+    assert hedged_session._hedge_executor is None
+    assert executor._shutdown is True
+
+
+def test_query_hedged_submit_error(hedged_session, mock_session_response):
+    executor = hedged_session._get_hedge_executor()
+    executor.shutdown()
+    req = Request("GET", url="https://foo", headers={"Accept": "application/json"})
+    prepared_request = hedged_session.prepare_request(req)
+    with pytest.raises(RuntimeError):
+        Query(hedged_session, prepared_request, endpoint="foo", hedge=True)
+    for _ in range(hedged_session.hedge_max_in_flight):
+        assert hedged_session._hedge_slots.acquire(blocking=False) is True
@@ -0,0 +1,131 @@
+import time
+
+import pytest
+from requests import Request
+
+from bookops_overdrive import FileRateLimiter, OverdriveSession
+from bookops_overdrive.errors import BookopsOverdriveError
+from bookops_overdrive.query import Query
+
+from .conftest import MockHTTPResponse
+
+
+class TestFileRateLimiter:
+    def test_defaults(self, tmp_path):
+        limiter = FileRateLimiter(str(tmp_path / "bucket"), rate=0.5)
+        assert limiter.capacity == 1
+        assert FileRateLimiter(str(tmp_path / "bucket"), rate=10).capacity == 10
+
+    @pytest.mark.parametrize("rate,capacity", [(0, None), (-1, 5), (5, 0)])
+    def test_invalid_rate(self, tmp_path, rate, capacity):
+        with pytest.raises(BookopsOverdriveError) as exc:
+            FileRateLimiter(str(tmp_path / "bucket"), rate=rate, capacity=capacity)
+        assert "Rate and capacity must be greater than 0." in str(exc.value)
+
+    def test_take_creates_file(self, tmp_path):
+        path = tmp_path / "bucket"
+        limiter = FileRateLimiter(str(path), rate=1, capacity=2)
+        assert limiter._take(1) == 0
+        assert path.exists()
+        assert limiter._take(1) == 0
+        assert 0 < limiter._take(1) <= 1
+
+    def test_shared_between_instances(self, tmp_path):
+        path = str(tmp_path / "bucket")
+        first = FileRateLimiter(path, rate=1, capacity=1)
+        second = FileRateLimiter(path, rate=1, capacity=1)
+        assert first._take(1) == 0
+        assert second._take(1) > 0
+
+    def test_try_acquire(self, tmp_path):
+        limiter = FileRateLimiter(str(tmp_path / "bucket"), rate=1, capacity=1)
+        assert limiter.try_acquire() is True
+        assert limiter.try_acquire() is False
+
+    def test_acquire_blocks(self, tmp_path):
+        limiter = FileRateLimiter(str(tmp_path / "bucket"), rate=20, capacity=1)
+        start = time.monotonic()
+        for _ in range(3):
+            limiter.acquire()
+        assert time.monotonic() - start >= 0.09
+
+
+class CountingLimiter:
+    def __init__(self, wait=0, tokens=True):
+        self.calls = 0
+        self.tokens = tokens
+        self.wait = wait
+
+    def acquire(self):
+        self.calls += 1
+        time.sleep(self.wait)
+
+    def try_acquire(self):
+        if self.tokens:
+            self.calls += 1
+        return self.tokens
+
+
+def test_session_rate_limiter(mock_token, mock_session_response):
+    limiter = CountingLimiter()
+    with OverdriveSession(authorization=mock_token, rate_limiter=limiter) as session:
+        req = Request("GET", url="https://foo", headers={"Accept": "application/json"})
+        Query(session, session.prepare_request(req))
+        session.get_title_metadata(collectionToken="foo", reserveId="bar")
+        assert limiter.calls == 2
+
+
+@pytest.fixture
+def slow_send(monkeypatch):
+    calls = []
+
+    def send(*args, **kwargs):
+        calls.append(1)
+        time.sleep(0.2)
+        return MockHTTPResponse(http_code=200)
+
+    monkeypatch.setattr("requests.Session.send", send)
+    return calls
+
+
+def hedged_session(token, limiter):
+    session = OverdriveSession(
+        authorization=token, hedge_percentile=90, rate_limiter=limiter
+    )
+    for _ in range(20):
+        session._get_latency_tracker("foo").record(0.05)
+    return session
+
+
+def test_hedged_duplicate_takes_token(mock_token, slow_send):
+    limiter = CountingLimiter()
+    with hedged_session(mock_token, limiter) as session:
+        req = Request("GET", url="https://foo")
+        Query(session, session.prepare_request(req), endpoint="foo", hedge=True)
+        assert len(slow_send) == 2
+        assert limiter.calls == 2
+
+
+def test_hedged_no_duplicate_without_token(mock_token, slow_send):
+    limiter = CountingLimiter(tokens=False)
+    with hedged_session(mock_token, limiter) as session:
+        req = Request("GET", url="https://foo")
+        Query(session, session.prepare_request(req), endpoint="foo", hedge=True)
+        assert len(slow_send) == 1
+        assert limiter.calls == 1
+
+
+def test_hedge_timer_excludes_limiter_wait(mock_token, monkeypatch):
+    calls = []
+
+    def send(*args, **kwargs):
+        calls.append(1)
+        return MockHTTPResponse(http_code=200)
+
+    monkeypatch.setattr("requests.Session.send", send)
+    limiter = CountingLimiter(wait=0.2)
+    with hedged_session(mock_token, limiter) as session:
+        req = Request("GET", url="https://foo")
+        Query(session, session.prepare_request(req), endpoint="foo", hedge=True)
+        assert len(calls) == 1
+        assert limiter.calls == 1
@@ -0,0 +1,63 @@
+import pytest
+
+from bookops_overdrive.resilience import CircuitBreaker, LatencyTracker
+
+
+class TestLatencyTracker:
+    def test_percentile_not_enough_samples(self):
+        tracker = LatencyTracker(min_samples=3)
+        tracker.record(0.1)
+        tracker.record(0.2)
+        assert len(tracker) == 2
+        assert tracker.percentile(95) is None
+
+    @pytest.mark.parametrize(
+        "pct,expected", [(0, 0.1), (50, 0.5), (90, 0.9), (95, 1.0), (100, 1.0)]
+    )
+    def test_percentile(self, pct, expected):
+        tracker = LatencyTracker(min_samples=1)
+        for i in range(10, 0, -1):
+            tracker.record(i / 10)
+        assert tracker.percentile(pct) == expected
+
+    def test_window(self):
+        tracker = LatencyTracker(window=3, min_samples=1)
+        for i in range(10):
+            tracker.record(float(i))
+        assert len(tracker) == 3
+        assert tracker.percentile(0) == 7.0
+
+
+class TestCircuitBreaker:
+    def test_opens_after_threshold(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        breaker.record_failure()
+        assert breaker.state == "closed"
+        assert breaker.allow_request() is True
+        breaker.record_failure()
+        assert breaker.state == "open"
+        assert breaker.allow_request() is False
+
+    def test_success_resets_failures(self):
+        breaker = CircuitBreaker(failure_threshold=2)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        assert breaker.state == "closed"
+
+    def test_half_open_single_trial(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        assert breaker.state == "half-open"
+        assert breaker.allow_request() is True
+        assert breaker.allow_request() is False
+        breaker.record_success()
+        assert breaker.state == "closed"
+
+    def test_half_open_trial_failure(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        assert breaker.allow_request() is True
+        breaker.record_failure()
+        breaker.reset_timeout = 60
+        assert breaker.state == "open"
@@ -0,0 +1,267 @@
+import json
+import threading
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from bookops_overdrive import AvailabilityScheduler
+from bookops_overdrive.errors import BookopsOverdriveError
+
+from .conftest import MockHTTPResponse
+
+
+@pytest.fixture
+def copies():
+    return {}
+
+
+@pytest.fixture
+def mock_availability_response(monkeypatch, copies):
+    requested = []
+
+    def mock_api_response(session, prepared_request, **kwargs):
+        ids = parse_qs(urlsplit(prepared_request.url).query)["products"][0].split(",")
+        requested.append(ids)
+        availability = [
+            {"reserveId": i.upper(), "copiesOwned": 2, "copiesAvailable": copies[i]}
+            for i in ids
+            if i in copies
+        ]
+        content = json.dumps({"availability": availability}).encode()
+        return MockHTTPResponse(http_code=200, content=content)
+
+    monkeypatch.setattr("requests.Session.send", mock_api_response)
+    return requested
+
+
+class TestAvailabilityScheduler:
+    def test_track(self, stub_session):
+        scheduler = AvailabilityScheduler(stub_session, "foo", interval=30)
+        scheduler.track("ABC")
+        scheduler.track("abc", interval=10, priority=1)
+        assert len(scheduler) == 1
+        assert "Abc" in scheduler
+        assert scheduler.availability("abc") is None
+        scheduler.untrack("ABC")
+        scheduler.untrack("ABC")
+        assert len(scheduler) == 0
+
+    def test_due_ordered_by_priority(self, stub_session):
+        scheduler = AvailabilityScheduler(stub_session, "foo")
+        scheduler.track("a")
+        scheduler.track("b", priority=5)
+        scheduler.track("c", priority=1)
+        assert scheduler.due() == ["b", "c", "a"]
+        assert scheduler.due(now=0) == []
+
+    def test_poll_nothing_due(self, stub_session, mock_availability_response):
+        scheduler = AvailabilityScheduler(stub_session, "foo")
+        assert scheduler.poll() == []
+        assert mock_availability_response == []
+
+    def test_poll_batches(self, stub_session, mock_availability_response, copies):
+        scheduler = AvailabilityScheduler(stub_session, "foo")
+        for i in range(60):
+            copies[f"id{i}"] = 1
+            scheduler.track(f"id{i}")
+        changed = scheduler.poll()
+        assert len(changed) == 60
+        assert sorted(len(ids) for ids in mock_availability_response) == [10, 25, 25]
+        assert scheduler.availability("ID0")["copiesAvailable"] == 1
+        assert scheduler.due() == []
+
+    def test_poll_notifies_only_on_change(
+        self, stub_session, mock_availability_response, copies
+    ):
+        notifications = []
+        scheduler = AvailabilityScheduler(stub_session, "foo", interval=0)
+        scheduler.subscribe(lambda *args: notifications.append(args))
+        copies.update({"a": 1, "b": 1})
+        scheduler.track("a")
+        scheduler.track("b")
+        assert sorted(scheduler.poll()) == ["a", "b"]
+        assert len(notifications) == 2
+        assert notifications[0][1] is None
+
+        copies["a"] = 0
+        assert scheduler.poll() == ["a"]
+        assert notifications[-1][0] == "a"
+        assert notifications[-1][1]["copiesAvailable"] == 1
+        assert notifications[-1][2]["copiesAvailable"] == 0
+        assert len(notifications) == 3
+
+    def test_poll_untracked_and_missing_titles(
+        self, stub_session, mock_availability_response, copies
+    ):
+        scheduler = AvailabilityScheduler(stub_session, "foo")
+        copies["a"] = 1
+        scheduler.track("b")
+        assert scheduler.poll() == []
+        assert scheduler.due() == []
+        assert scheduler._update("a", {"copiesAvailable": 1}) is False
+
+    def test_unsubscribe(self, stub_session, mock_availability_response, copies):
+        notifications = []
+        scheduler = AvailabilityScheduler(stub_session, "foo")
+        scheduler.subscribe(notifications.append)
+        scheduler.unsubscribe(notifications.append)
+        copies["a"] = 1
+        scheduler.track("a")
+        scheduler.poll()
+        assert notifications == []
+
+    @pytest.mark.http_code(404)
+    def test_poll_error(self, stub_session, mock_session_response):
+        scheduler = AvailabilityScheduler(stub_session, "foo")
+        scheduler.track("a")
+        with pytest.raises(BookopsOverdriveError):
+            scheduler.poll()
+        assert scheduler.due() == ["a"]
+
+    def test_run(self, stub_session, mock_availability_response, copies):
+        stop = threading.Event()
+        scheduler = AvailabilityScheduler(stub_session, "foo")
+        scheduler.subscribe(lambda *args: stop.set())
+        copies["a"] = 1
+        scheduler.track("a")
+        scheduler.run(stop, tick=0.01)
+        assert scheduler.availability("a")["copiesAvailable"] == 1
+
+    def test_run_empty(self, stub_session):
+        stop = threading.Event()
+        scheduler = AvailabilityScheduler(stub_session, "foo")
+        threading.Timer(0.05, stop.set).start()
+        scheduler.run(stop, tick=0.01)
+        assert stop.is_set()
+
+    def test_poll_max_batches(self, stub_session, mock_availability_response, copies):
+        scheduler = AvailabilityScheduler(stub_session, "foo", max_batches=1)
+        for i in range(30):
+            copies[f"id{i}"] = 1
+            scheduler.track(f"id{i}", priority=1 if i >= 25 else 0)
+        first = scheduler.poll()
+        assert len(mock_availability_response) == 1
+        assert len(first) == 25
+        assert {f"id{i}" for i in range(25, 30)} <= set(first)
+        assert len(scheduler.due()) == 5
+        assert len(scheduler.poll()) == 5
+        assert scheduler.due() == []
+
+    def test_poll_invalid_json(self, stub_session, mock_session_response):
+        scheduler = AvailabilityScheduler(stub_session, "foo")
+        scheduler.track("a")
+        with pytest.raises(BookopsOverdriveError) as exc:
+            scheduler.poll()
+        assert "Unable to parse availability response: " in str(exc.value)
+        assert scheduler.due() == ["a"]
+
+    def test_run_continues_after_error(
+        self, stub_session, monkeypatch, mock_availability_response, copies
+    ):
+        errors = []
+        stop = threading.Event()
+        scheduler = AvailabilityScheduler(stub_session, "foo")
+        scheduler.subscribe(lambda *args: stop.set())
+        fetch = scheduler._fetch
+
+        def flaky_fetch(reserveIds):
+            if not errors:
+                raise BookopsOverdriveError("500 Server Error")
+            return fetch(reserveIds)
+
+        monkeypatch.setattr(scheduler, "_fetch", flaky_fetch)
+        copies["a"] = 1
+        scheduler.track("a")
+        scheduler.run(stop, tick=0.01, on_error=errors.append)
+        assert len(errors) == 1
+        assert scheduler.availability("a")["copiesAvailable"] == 1
+
+    def test_run_error_without_hook(self, stub_session, monkeypatch):
+        stop = threading.Event()
+        scheduler = AvailabilityScheduler(stub_session, "foo")
+
+        def failing_fetch(reserveIds):
+            stop.set()
+            raise BookopsOverdriveError("500 Server Error")
+
+        monkeypatch.setattr(scheduler, "_fetch", failing_fetch)
+        scheduler.track("a")
+        scheduler.run(stop, tick=0.01)
+        assert scheduler.due() == ["a"]
+
+    def test_run_raising_subscriber(
+        self, stub_session, mock_availability_response, copies
+    ):
+        errors = []
+        notifications = []
+        stop = threading.Event()
+        scheduler = AvailabilityScheduler(stub_session, "foo", interval=0)
+
+        def raising_callback(reserveId, previous, availability):
+            raise KeyError(reserveId)
+
+        def second_callback(reserveId, previous, availability):
+            notifications.append((reserveId, availability["copiesAvailable"]))
+            if availability["copiesAvailable"] == 1:
+                copies["a"] = 0
+            else:
+                stop.set()
+
+        scheduler.subscribe(raising_callback)
+        scheduler.subscribe(second_callback)
+        copies.update({"a": 1, "b": 1})
+        scheduler.track("a")
+        scheduler.track("b")
+        scheduler.run(stop, tick=0.01, on_error=errors.append)
+        assert ("a", 1) in notifications
+        assert ("b", 1) in notifications
+        assert ("a", 0) in notifications
+        assert len(errors) == 3
+        assert all(isinstance(e, KeyError) for e in errors)
+
+    def test_poll_raising_subscriber_logged(
+        self, stub_session, mock_availability_response, copies, caplog
+    ):
+        notifications = []
+        scheduler = AvailabilityScheduler(stub_session, "foo")
+        scheduler.subscribe(lambda *args: {}["missing"])
+        scheduler.subscribe(lambda *args: notifications.append(args[0]))
+        copies["a"] = 1
+        scheduler.track("a")
+        assert scheduler.poll() == ["a"]
+        assert notifications == ["a"]
+        assert "Availability subscriber failed for a" in caplog.text
+
+    @pytest.mark.parametrize("content", [b"[]", b"null"])
+    def test_poll_unexpected_json(self, stub_session, monkeypatch, content):
+        def mock_api_response(*args, **kwargs):
+            return MockHTTPResponse(http_code=200, content=content)
+
+        monkeypatch.setattr("requests.Session.send", mock_api_response)
+        scheduler = AvailabilityScheduler(stub_session, "foo")
+        scheduler.track("a")
+        with pytest.raises(BookopsOverdriveError) as exc:
+            scheduler.poll()
+        assert "Unexpected availability response: " in str(exc.value)
+
+    def test_poll_null_availability(self, stub_session, monkeypatch):
+        def mock_api_response(*args, **kwargs):
+            return MockHTTPResponse(http_code=200, content=b'{"availability": null}')
+
+        monkeypatch.setattr("requests.Session.send", mock_api_response)
+        scheduler = AvailabilityScheduler(stub_session, "foo")
+        scheduler.track("a")
+        assert scheduler.poll() == []
+
+    def test_run_unexpected_error_logged(self, stub_session, monkeypatch, caplog):
+        stop = threading.Event()
+        scheduler = AvailabilityScheduler(stub_session, "foo")
+
+        def failing_fetch(reserveIds):
+            stop.set()
+            raise RuntimeError("boom")
+
+        monkeypatch.setattr(scheduler, "_fetch", failing_fetch)
+        scheduler.track("a")
+        scheduler.run(stop, tick=0.01)
+        assert "Availability poll failed" in caplog.text
@@ -15,6 +15,22 @@ class TestOverdriveSession:
             )
             assert session.headers["User-Agent"] == "bookops-overdrive/0.0.1"
 
+    def test_session_resilience_options(self, mock_token):
+        with OverdriveSession(
+            authorization=mock_token,
+            hedge_percentile=95,
+            breaker_threshold=3,
+            breaker_reset_timeout=10,
+        ) as session:
+            assert session.hedge_percentile == 95
+            breaker = session._get_circuit_breaker("title_metadata")
+            assert breaker.failure_threshold == 3
+            assert breaker.reset_timeout == 10
+            assert session._get_circuit_breaker("title_metadata") is breaker
+
+    def test_session_circuit_breaker_disabled(self, stub_session):
+        assert stub_session._get_circuit_breaker("title_metadata") is None
+
     def test_session_refresh_token(self, mock_expired_token):
         with OverdriveSession(authorization=mock_expired_token) as session:
             stale_token_expiration = session.authorization.expires_at
@@ -51,6 +67,20 @@ class TestOverdriveSession:
         assert response.status_code == 200
         assert response.reason == "OK"
 
+    @pytest.mark.parametrize("ids", ["123,456", ["123", "456"], "123"])
+    def test_get_bulk_availability(self, stub_session, ids):
+        response = stub_session.get_bulk_availability(
+            collectionToken="foo", reserveIds=ids
+        )
+        assert response.status_code == 200
+        assert response.reason == "OK"
+
+    def test_url_collections_availability(self, stub_session):
+        assert (
+            stub_session._url_collections_availability("foo")
+            == "https://api.overdrive.com/v2/collections/foo/availability"
+        )
+
     @pytest.mark.parametrize("ids", ["123,456", ["123", "456"], "123"])
     def test_get_bulk_metadata(self, stub_session, ids):
         response = stub_session.get_bulk_metadata(collectionToken="foo", reserveIds=ids)